@@ -1,5 +1,6 @@
 import pandas as pd
 import os
+import sys
 import streamlit as st
 import hashlib
 import time
@@ -8,10 +9,23 @@ from pathlib import Path
 import shutil
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 import numpy as np
+import xlrd
+import threading
+import pyarrow as pa
+import pyarrow.feather as feather
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
 
 # 核心配置：文件夹路径（可修改）
 folder_path = "生产看板数据"
+# 多副本共享快照目录：多个看板进程指向同一目录时，只由一个进程解析变更文件
+shared_snapshot_path = os.environ.get("CHIP_DASHBOARD_SHARED_DIR", str(Path.home() / ".chip_production_dashboard" / "shared"))
 
 # 获取稳定的用户数据文件路径
 def get_users_file_path():
@@ -291,10 +305,170 @@ def get_excel_engine(file_name):
     else:
         return None
 
-def process_hexin(results):
+# 文件格式登记：文件名规则 + 各工作表表头行号及解析时按位置读取的列名
+# sheets 的键为工作表名，整数 0 表示第一个工作表；columns 的键为列位置（从0开始）
+file_schema_registry = {
+    "禾芯": {
+        "supplier": "禾芯",
+        "name_match": lambda f: f.split('.')[0].isdigit(),
+        "sheets": {
+            "wip": {"header_row": 0, "columns": {1: 'CUSTOMER_LOT_ID', 5: 'CUSTOMER_DEVICE_NAME', 7: 'WAFER_QTY'}},
+            "Finished Products": {"header_row": 0, "columns": {1: 'CUSTOMER_DEVICE_NAME', 2: 'IN_DATE', 3: 'GOOD_DIE_QTY(ea)', 5: 'CUSTOMER_LOT'}}
+        }
+    },
+    "日荣": {
+        "supplier": "日荣",
+        "name_match": lambda f: f.startswith('ITS'),
+        "sheets": {
+            "ATX WIP": {"header_row": 5, "columns": {
+                1: 'CUST DEVICE TYPE', 4: 'SOURCE LOT', 7: 'PO_NUMBER', 9: 'Order_Qty', 12: 'LotStart',
+                13: 'SMT', 14: 'W/G', 15: 'W/S', 16: 'FC/B', 17: 'UF', 18: 'M/D', 19: 'M/K', 20: 'S/G', 21: 'FVI', 22: 'P/K'
+            }},
+            "ATX FG": {"header_row": 4, "columns": {1: 'Qty', 2: 'WAFER_TARGET_LOT', 8: 'TARGET_CUSTOMER_DEV', 13: 'DATE_CODE'}}
+        }
+    },
+    "弘润_WMS": {
+        "supplier": "弘润",
+        "name_match": lambda f: 'CNEIC' in f and 'WMS' in f,
+        "sheets": {
+            0: {"header_row": 0, "columns": {5: 'device', 6: '客户批次', 7: 'waferlot', 16: 'ar qty'}}
+        }
+    },
+    "弘润_WIP": {
+        "supplier": "弘润",
+        "name_match": lambda f: 'CNEIC' in f and 'WIP' in f,
+        "sheets": {
+            0: {"header_row": 0, "columns": {3: 'device_name', 4: 'production_order', 7: '订单形态', 8: '客户批号', 12: 'date_code', 15: '当前数量', 16: 'bin别'}}
+        }
+    },
+    "弘润_成品库存": {
+        "supplier": "弘润",
+        "name_match": lambda f: 'CNEIC' in f and '成品库存' in f,
+        "sheets": {
+            0: {"header_row": 0, "columns": {3: 'Cus PO No.', 5: 'Device', 11: '客户批次', 13: 'Date Code', 16: 'Bin别', 17: '库存数量'}}
+        }
+    },
+    "伟测": {
+        "supplier": "伟测",
+        "name_match": lambda f: 'LXQ' in f,
+        "sheets": {
+            "WIP": {"header_row": 0, "columns": {7: '来料型号', 9: '来料批号', 14: 'DateCode', 17: 'Step', 18: 'BIN', 19: 'QTY', 22: '站点解释'}}
+        }
+    }
+}
+
+def normalize_header(value):
+    return "" if pd.isna(value) else str(value).strip()
+
+# 登记格式中的工作表（名称或序号）对应到文件中的实际工作表名，不存在时为 None
+def resolve_sheet_name(sheet_names, sheet):
+    if isinstance(sheet, int):
+        return sheet_names[sheet] if sheet < len(sheet_names) else None
+    return sheet if sheet in sheet_names else None
+
+# 读取登记格式涉及的各工作表表头区域，返回 (工作表名列表, {工作表名: 前若干行})
+# .xls 按需加载工作表，避免 xlrd 解析整个工作簿
+def read_header_rows(file_path, file_name):
+    header_rows_needed = max(sheet_schema["header_row"] for schema in file_schema_registry.values() for sheet_schema in schema["sheets"].values()) + 1
+    sheets = {sheet for schema in file_schema_registry.values() for sheet in schema["sheets"]}
+    header_rows = {}
+    if get_excel_engine(file_name) == "xlrd":
+        book = xlrd.open_workbook(file_path, on_demand=True)
+        try:
+            sheet_names = book.sheet_names()
+            for sheet_name in {resolve_sheet_name(sheet_names, sheet) for sheet in sheets} - {None}:
+                xl_sheet = book.sheet_by_name(sheet_name)
+                header_rows[sheet_name] = [xl_sheet.row_values(row) for row in range(min(header_rows_needed, xl_sheet.nrows))]
+                book.unload_sheet(sheet_name)
+        finally:
+            book.release_resources()
+    else:
+        with pd.ExcelFile(file_path, engine=get_excel_engine(file_name)) as xls:
+            sheet_names = xls.sheet_names
+            for sheet_name in {resolve_sheet_name(sheet_names, sheet) for sheet in sheets} - {None}:
+                header_rows[sheet_name] = xls.parse(sheet_name, header=None, nrows=header_rows_needed).values.tolist()
+    return sheet_names, header_rows
+
+# 表头与登记格式比对，返回差异列表（为空表示一致）
+def check_file_schema(sheet_names, header_rows, schema):
+    diffs = []
+    for sheet, sheet_schema in schema["sheets"].items():
+        sheet_name = resolve_sheet_name(sheet_names, sheet)
+        if sheet_name is None:
+            diffs.append(f"缺少工作表「{sheet}」")
+            continue
+        header_row = sheet_schema["header_row"]
+        rows = header_rows[sheet_name]
+        headers = rows[header_row] if len(rows) > header_row else []
+        for col_idx, expected in sheet_schema["columns"].items():
+            actual = normalize_header(headers[col_idx]) if col_idx < len(headers) else ""
+            if actual != expected:
+                diffs.append(f"「{sheet_name}」第{col_idx + 1}列 期望「{expected}」实际「{actual}」")
+    return diffs
+
+# 识别单个文件的格式，返回 (匹配的格式, 文件名对应的格式, 与文件名对应格式的差异)
+# 按文件名、修改时间和大小缓存，文件未变化时刷新页面不再打开工作簿；读取失败抛出异常，不缓存
+@st.cache_data(show_spinner=False, max_entries=256)
+def fingerprint_file(file_name, mtime_ns, size):
+    sheet_names, header_rows = read_header_rows(os.path.join(folder_path, file_name), file_name)
+    name_keys = [key for key, schema in file_schema_registry.items() if schema["name_match"](file_name)][:1]
+    candidate_keys = name_keys + [key for key in file_schema_registry if key not in name_keys]
+    name_diffs = []
+    for key in candidate_keys:
+        diffs = check_file_schema(sheet_names, header_rows, file_schema_registry[key])
+        if not diffs:
+            return key, name_keys, []
+        if key in name_keys:
+            name_diffs = diffs
+    return None, name_keys, name_diffs
+
+# 按文件名规则判断文件所属供应商，无法判断时为 None
+def get_file_supplier(file_name):
+    for schema in file_schema_registry.values():
+        if schema["name_match"](file_name):
+            return schema["supplier"]
+    return None
+
+# 按文件名初步路由，再用表头指纹确认；表头不符的文件在完整解析前拒绝
+# 未按文件名匹配、但表头与某一登记格式一致的文件同样解析，并在读取详情中提示
+def route_files(results):
+    routed_files = {"禾芯": [], "日荣": [], "弘润": [], "伟测": []}
+    excel_files = sorted(f for f in os.listdir(folder_path) if f.endswith(('.xls', '.xlsx')))
+    for file_name in excel_files:
+        file_path = os.path.join(folder_path, file_name)
+        # 跳过 Excel 打开文件时生成的 ~$ 临时文件
+        if file_name.startswith('~$') or not os.path.isfile(file_path):
+            continue
+        supplier = get_file_supplier(file_name)
+        try:
+            stat = os.stat(file_path)
+            matched_key, name_keys, name_diffs = fingerprint_file(file_name, stat.st_mtime_ns, stat.st_size)
+        except PermissionError:
+            if supplier:
+                results.append({"file": file_name, "status": "error", "msg": f"文件《{file_name}》权限不足，请关闭文件后重试"})
+            continue
+        except Exception as e:
+            # 文件名不属于任何供应商且无法读取表头的文件视为无关文件
+            if supplier:
+                results.append({"file": file_name, "status": "error", "msg": f"文件《{file_name}》表头读取失败：{str(e)}"})
+            elif 'CNEIC' in file_name:
+                results.append({"file": file_name, "status": "warning", "msg": f"弘润文件《{file_name}》未匹配提取规则，跳过"})
+            continue
+
+        if matched_key:
+            routed_files[file_schema_registry[matched_key]["supplier"]].append((file_name, matched_key))
+            if matched_key not in name_keys:
+                results.append({"file": file_name, "status": "warning", "msg": f"文件《{file_name}》文件名未匹配命名规则，已按表头识别为{matched_key}格式解析，请确认不是重复文件"})
+        elif name_keys:
+            supplier = file_schema_registry[name_keys[0]]["supplier"]
+            results.append({"file": file_name, "status": "error", "msg": f"{supplier}文件《{file_name}》表头与登记格式不一致，已拒绝解析：{'；'.join(name_diffs)}"})
+        elif 'CNEIC' in file_name:
+            results.append({"file": file_name, "status": "warning", "msg": f"弘润文件《{file_name}》未匹配提取规则，跳过"})
+    return routed_files
+
+def process_hexin(results, hexin_files):
     hexin_data = pd.DataFrame()
-    hexin_files = [f for f in os.listdir(folder_path) if f.split('.')[0].isdigit() and f.endswith(('.xls', '.xlsx'))]
-    for file_name in hexin_files:
+    for file_name, schema_key in hexin_files:
         file_path = os.path.join(folder_path, file_name)
         if not os.path.isfile(file_path):
             results.append({"file": file_name, "status": "error", "msg": f"禾芯文件《{file_name}》路径不存在"})
@@ -313,7 +487,7 @@ def process_hexin(results):
             wip_extracted['数量'] = pd.to_numeric(wip_extracted['晶圆数量/WAFER QTY'], errors='coerce')
 
             df_fin = pd.read_excel(file_path, sheet_name="Finished Products", header=0, engine=engine)
-            fin_extracted = df_fin.iloc[:, [1, 2, 3, 4]].copy()
+            fin_extracted = df_fin.iloc[:, [1, 2, 3, 5]].copy()
             fin_extracted.columns = ['晶圆型号/WAFER DEVICE', '入库日期', '芯片数量/GOOD DIE QTY', '批次号/LOT NO']
             fin_extracted['供应商'] = '禾芯'
             fin_extracted['环节'] = 'BP_已完成'
@@ -328,10 +502,11 @@ def process_hexin(results):
             results.append({"file": file_name, "status": "error", "msg": f"禾芯文件《{file_name}》提取失败：{str(e)}"})
     return hexin_data
 
-def process_rirong(results):
+def process_rirong(results, rirong_files):
     rirong_data = pd.DataFrame()
-    rirong_files = [f for f in os.listdir(folder_path) if f.startswith('ITS') and f.endswith(('.xls', '.xlsx'))]
-    for file_name in rirong_files:
+    wip_header_row = file_schema_registry["日荣"]["sheets"]["ATX WIP"]["header_row"]
+    fg_header_row = file_schema_registry["日荣"]["sheets"]["ATX FG"]["header_row"]
+    for file_name, schema_key in rirong_files:
         file_path = os.path.join(folder_path, file_name)
         engine = get_excel_engine(file_name)
         if not engine:
@@ -340,11 +515,11 @@ def process_rirong(results):
         try:
             df_wip = pd.read_excel(file_path, sheet_name="ATX WIP", header=None, engine=engine)
             process_columns = list(range(13, 23))
-            process_names = df_wip.iloc[5, process_columns].tolist()
-            wip_extracted = df_wip.iloc[6:, [1, 4, 7, 9, 12]].copy()
+            process_names = df_wip.iloc[wip_header_row, process_columns].tolist()
+            wip_extracted = df_wip.iloc[wip_header_row + 1:, [1, 4, 7, 9, 12]].copy()
             wip_extracted.columns = ['芯片名称/DEVICE NAME', '批次号/LOT NO', '封装订单号/ASY PO', '下单数量/ORDER QTY', '开始时间/START TIME']
             wip_extracted['晶圆型号/WAFER DEVICE'] = wip_extracted['芯片名称/DEVICE NAME']
-            process_data = df_wip.iloc[6:, process_columns].copy()
+            process_data = df_wip.iloc[wip_header_row + 1:, process_columns].copy()
             current_processes = []
             current_qtys = []
             for idx, row in process_data.iterrows():
@@ -369,7 +544,7 @@ def process_rirong(results):
             wip_extracted['数量'] = pd.to_numeric(wip_extracted['当前数量/WIP QTY'], errors='coerce')
 
             df_fg = pd.read_excel(file_path, sheet_name="ATX FG", header=None, engine=engine)
-            fg_extracted = df_fg.iloc[6:, [1, 2, 8, 13]].copy() if len(df_fg) > 6 else pd.DataFrame(columns=[1, 2, 8, 13])
+            fg_extracted = df_fg.iloc[fg_header_row + 1:, [1, 2, 8, 13]].copy() if len(df_fg) > fg_header_row + 1 else pd.DataFrame(columns=[1, 2, 8, 13])
             fg_extracted.columns = ['已加工完成芯片数量', '批次号/LOT NO', '芯片名称/DEVICE NAME', '封装周码/DATE CODE']
             fg_extracted['晶圆型号/WAFER DEVICE'] = fg_extracted['芯片名称/DEVICE NAME']
             fg_extracted['供应商'] = '日荣'
@@ -393,25 +568,26 @@ def process_rirong(results):
         rirong_data = pd.concat([rirong_data, empty_wip, empty_fg], ignore_index=True)
     return rirong_data
 
-def process_hongrun(results):
+def process_hongrun(results, hongrun_files):
     hongrun_data = pd.DataFrame()
-    hongrun_files = [f for f in os.listdir(folder_path) if 'CNEIC' in f and f.endswith(('.xls', '.xlsx'))]
-    for file_name in hongrun_files:
+    for file_name, schema_key in hongrun_files:
         file_path = os.path.join(folder_path, file_name)
         engine = get_excel_engine(file_name)
         if not engine:
             results.append({"file": file_name, "status": "error", "msg": f"弘润文件《{file_name}》格式不支持"})
             continue
         try:
-            if 'WMS' in file_name:
+            if schema_key == '弘润_WMS':
                 df = pd.read_excel(file_path, header=0, engine=engine)
                 extracted = df.iloc[:, [5, 7, 16]].copy()
                 extracted.columns = ['芯片名称/DEVICE NAME', '批次号/LOT NO', '来料数量/IM QTY']
+                # waferlot 未填写时使用客户批次
+                extracted['批次号/LOT NO'] = extracted['批次号/LOT NO'].fillna(df.iloc[:, 6])
                 extracted['晶圆型号/WAFER DEVICE'] = extracted['芯片名称/DEVICE NAME']
                 extracted['供应商'] = '弘润'
                 extracted['环节'] = 'FT_来料仓未测试'
                 extracted['数量'] = pd.to_numeric(extracted['来料数量/IM QTY'], errors='coerce')
-            elif 'WIP' in file_name:
+            elif schema_key == '弘润_WIP':
                 df = pd.read_excel(file_path, header=0, engine=engine)
                 extracted = df.iloc[:, [3, 4, 7, 8, 12, 15, 16]].copy()
                 extracted.columns = ['芯片名称/DEVICE NAME', '测试订单号/FT PO', '测试类型/FT\\RT', '批次号/LOT NO', '封装周码/DATE CODE', '当前数量/WIP QTY', 'BIN别/BIN']
@@ -419,7 +595,7 @@ def process_hongrun(results):
                 extracted['供应商'] = '弘润'
                 extracted['环节'] = 'FT_WIP'
                 extracted['数量'] = pd.to_numeric(extracted['当前数量/WIP QTY'], errors='coerce')
-            elif '成品库存' in file_name:
+            else:
                 df = pd.read_excel(file_path, header=0, engine=engine)
                 extracted = df.iloc[:, [3, 5, 11, 13, 16, 17]].copy()
                 extracted.columns = ['测试订单号/FT PO', '芯片名称/DEVICE NAME', '批次号/LOT NO', '封装周码/DATE CODE', 'BIN别/BIN', '库存数量']
@@ -427,9 +603,6 @@ def process_hongrun(results):
                 extracted['供应商'] = '弘润'
                 extracted['环节'] = 'FT_成品库存'
                 extracted['数量'] = pd.to_numeric(extracted['库存数量'], errors='coerce')
-            else:
-                st.warning(f"⚠️ 弘润文件《{file_name}》未匹配提取规则，跳过")
-                continue
 
             hongrun_data = pd.concat([hongrun_data, extracted], ignore_index=True)
             results.append({"file": file_name, "status": "success", "msg": f"弘润文件《{file_name}》提取成功！"})
@@ -437,10 +610,9 @@ def process_hongrun(results):
             results.append({"file": file_name, "status": "error", "msg": f"弘润文件《{file_name}》提取失败：{str(e)}"})
     return hongrun_data
 
-def process_weice(results):
+def process_weice(results, weice_files):
     weice_data = pd.DataFrame()
-    weice_files = [f for f in os.listdir(folder_path) if 'LXQ' in f and f.endswith(('.xls', '.xlsx'))]
-    for file_name in weice_files:
+    for file_name, schema_key in weice_files:
         file_path = os.path.join(folder_path, file_name)
         if not os.path.isfile(file_path):
             results.append({"file": file_name, "status": "error", "msg": f"伟测文件《{file_name}》路径不存在"})
@@ -486,6 +658,23 @@ def process_weice(results):
             results.append({"file": file_name, "status": "error", "msg": f"伟测文件《{file_name}》提取失败：{str(e)}"})
     return weice_data
 
+# 后台线程并行解析各供应商文件，按完成先后逐个返回 (供应商, 数据, 文件读取结果)
+def iter_supplier_data(routed_files):
+    supplier_parsers = {"禾芯": process_hexin, "日荣": process_rirong, "弘润": process_hongrun, "伟测": process_weice}
+    with ThreadPoolExecutor(max_workers=len(supplier_parsers)) as executor:
+        futures = {}
+        for supplier, parser in supplier_parsers.items():
+            supplier_results = []
+            futures[executor.submit(load_supplier_data, supplier, parser, supplier_results, routed_files[supplier])] = (supplier, supplier_results)
+        for future in as_completed(futures):
+            supplier, supplier_results = futures[future]
+            try:
+                supplier_data = future.result()
+            except Exception as e:
+                supplier_data = pd.DataFrame()
+                supplier_results.append({"file": supplier, "status": "error", "msg": f"{supplier}数据提取失败：{str(e)}"})
+            yield supplier, supplier_data, supplier_results
+
 def get_target_columns(supplier, process):
     if supplier == "全部" and process == "全部":
         return supplier_process_field_map["全部"]["全部"]
@@ -497,6 +686,160 @@ def get_target_columns(supplier, process):
     else:
         return supplier_process_field_map[supplier][process]
 
+# ---------------------- 多副本共享快照 ----------------------
+# 本进程已加载的共享快照：{供应商: (数据文件名, 数据, 文件读取结果)}
+# Streamlit 每次刷新都会重新执行脚本，需用 cache_resource 在进程内保留
+@st.cache_resource
+def get_shared_snapshot_cache():
+    return {}
+
+def get_shared_snapshot_dir():
+    shared_dir = Path(shared_snapshot_path)
+    shared_dir.mkdir(parents=True, exist_ok=True)
+    return shared_dir
+
+# 跨进程文件锁（阻塞等待），Windows 使用 msvcrt，其余平台使用 fcntl
+def lock_file(lock_handle):
+    if os.name == "nt":
+        lock_handle.seek(0)
+        while True:
+            try:
+                msvcrt.locking(lock_handle.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+    else:
+        fcntl.flock(lock_handle.fileno(), fcntl.LOCK_EX)
+
+# 非阻塞加锁，锁已被其他进程持有时返回 False
+def try_lock_file(lock_handle):
+    try:
+        if os.name == "nt":
+            lock_handle.seek(0)
+            msvcrt.locking(lock_handle.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(lock_handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+def unlock_file(lock_handle):
+    if os.name == "nt":
+        lock_handle.seek(0)
+        msvcrt.locking(lock_handle.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(lock_handle.fileno(), fcntl.LOCK_UN)
+
+def read_shared_manifest():
+    manifest_file = get_shared_snapshot_dir() / "manifest.json"
+    if not manifest_file.exists():
+        return {"version": 0, "suppliers": {}}
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+# 解析规则版本：修改解析逻辑后递增，使已发布的共享快照失效
+PARSER_VERSION = 3
+
+# 源文件签名：解析规则版本及文件名、格式、修改时间和大小均未变化则视为同一份数据
+def get_files_signature(supplier_files):
+    signature = []
+    for file_name, schema_key in supplier_files:
+        stat = os.stat(os.path.join(folder_path, file_name))
+        signature.append([file_name, schema_key, stat.st_mtime_ns, stat.st_size])
+    return [PARSER_VERSION] + sorted(signature)
+
+# 数据版本：各供应商源文件签名的摘要，用于判断预计算结果是否过期
+def get_data_version(routed_files):
+    signatures = {supplier: get_files_signature(files) for supplier, files in routed_files.items()}
+    return hashlib.md5(json.dumps(signatures, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+# 共享数据以 Arrow IPC（Feather）格式保存，读取时不执行任何代码
+# Excel 中同一列混有数字和文字时 Arrow 无法按单一类型保存，此类列统一转为文字
+def to_arrow_table(data):
+    columns = {}
+    for column in data.columns:
+        values = data[column]
+        if values.dtype == object:
+            try:
+                pa.array(values, from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                values = values.where(values.isna(), values.astype(str))
+        columns[column] = values
+    return pa.Table.from_pandas(pd.DataFrame(columns, index=data.index), preserve_index=False)
+
+# 读取共享快照；同一版本只加载一次
+def load_shared_entry(supplier, entry):
+    cached = get_shared_snapshot_cache().get(supplier)
+    if cached and cached[0] == entry["data_file"]:
+        return cached[1], cached[2]
+    data = feather.read_table(get_shared_snapshot_dir() / entry["data_file"], memory_map=False).to_pandas()
+    get_shared_snapshot_cache()[supplier] = (entry["data_file"], data, entry["results"])
+    return data, entry["results"]
+
+# 写入新版本数据文件后原子替换清单，其他进程读到新清单即切换到新版本
+# 返回按共享格式读回的数据，使发布进程与其他副本使用的数据一致
+def publish_shared_entry(supplier, signature, data, results):
+    shared_dir = get_shared_snapshot_dir()
+    data_file = f"{supplier}_{time.time_ns()}.arrow"
+    table = to_arrow_table(data)
+    feather.write_feather(table, shared_dir / data_file, compression='uncompressed')
+    data = table.to_pandas()
+
+    with open(shared_dir / "manifest.lock", 'a+') as lock_handle:
+        lock_file(lock_handle)
+        try:
+            manifest = read_shared_manifest()
+            old_entry = manifest["suppliers"].get(supplier, {})
+            manifest["version"] += 1
+            manifest["suppliers"][supplier] = {
+                "version": old_entry.get("version", 0) + 1,
+                "signature": signature,
+                "data_file": data_file,
+                "results": results,
+                "updated_at": time.strftime('%Y-%m-%d %H:%M:%S')
+            }
+            tmp_file = shared_dir / "manifest.json.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, shared_dir / "manifest.json")
+        finally:
+            unlock_file(lock_handle)
+
+    # 保留上一版本，供仍在读取的进程使用
+    stale_entry = old_entry.get("data_file")
+    for old_file in shared_dir.glob(f"{supplier}_*.*"):
+        if old_file.name not in (data_file, stale_entry):
+            try:
+                old_file.unlink()
+            except OSError:
+                pass
+    get_shared_snapshot_cache()[supplier] = (data_file, data, results)
+    return data
+
+# 读取供应商数据：共享快照与源文件一致时直接读取；否则竞争写锁，
+# 抢到锁的进程负责解析并发布，其余进程等待后读取其发布的新版本
+def load_supplier_data(supplier, parser, results, supplier_files):
+    signature = get_files_signature(supplier_files)
+    entry = read_shared_manifest()["suppliers"].get(supplier)
+    if not (entry and entry["signature"] == signature):
+        with open(get_shared_snapshot_dir() / f"{supplier}.lock", 'a+') as lock_handle:
+            lock_file(lock_handle)
+            try:
+                entry = read_shared_manifest()["suppliers"].get(supplier)
+                if not (entry and entry["signature"] == signature):
+                    supplier_results = []
+                    data = parser(supplier_results, supplier_files)
+                    results.extend(supplier_results)
+                    # 解析出错（如文件被占用）时不发布，下次刷新重新尝试
+                    if all(res["status"] != "error" for res in supplier_results):
+                        data = publish_shared_entry(supplier, signature, data, supplier_results)
+                    return data
+            finally:
+                unlock_file(lock_handle)
+    data, shared_results = load_shared_entry(supplier, entry)
+    results.extend(shared_results)
+    return data
+
 # ---------------------- 非线性缩放函数 ----------------------
 def nonlinear_scale(values):
     scaled = (values ** 0.2) * 300  
@@ -504,172 +847,266 @@ def nonlinear_scale(values):
     return scaled
 
 # ---------------------- 数据图模块 ----------------------
-def render_charts(all_data):
-    supplier = st.session_state.get("table_supplier_select", "全部")
-    process = st.session_state.get("table_process_select", "全部")
-    selected_wafer = st.session_state.get("table_wafer_select", ["全部"])
-    selected_device = st.session_state.get("table_device_select", ["全部"])
-    
-    chart_data = all_data.dropna(subset=['数量'])
+# 图表中单独显示的DEVICE数量（按总数量排名），其余合并为"其他"
+CHART_TOP_N_DEVICES = 20
+OTHER_DEVICE_LABEL = "其他"
+OTHER_DEVICE_COLOR = "#D3D3D3"
+# DEVICE配色：去掉重复颜色及与"其他"相近的灰色
+CHART_DEVICE_PALETTE = [
+    color for color in dict.fromkeys(px.colors.qualitative.Pastel1 + px.colors.qualitative.Pastel2 + px.colors.qualitative.Set3 + px.colors.qualitative.Pastel)
+    if len({value.strip() for value in color[4:-1].split(',')}) > 1
+]
+# 各供应商分开绘图，x轴统一按最多环节数取宽度，使各图柱宽一致
+CHART_X_SPAN = max(max(len(supplier_process_map[s]) for s in ['禾芯', '日荣', '弘润', '伟测']), 2.4)
+# 柱状图公共样式放在模板中，图表JSON里只保存一份；悬停模板中DEVICE名取自曲线名称
+CHART_TEMPLATE = go.layout.Template(pio.templates["plotly"])
+CHART_TEMPLATE.data.bar = [go.Bar(
+    textposition='outside',
+    textfont=dict(size=12, color='black', weight='bold'),
+    marker_line=dict(color='black', width=0.5),
+    hovertemplate="<b>DEVICE:</b> %{fullData.name}<br><b>环节:</b> %{x}<br><b>真实数量:</b> %{text}<extra></extra>",
+    width=0.8
+)]
+
+# 按排序后的DEVICE列表依次分配颜色，各供应商的数据图共用同一份配色
+def build_device_color_map(data):
+    devices = sorted(data['芯片名称/DEVICE NAME'].fillna("未知DEVICE").unique().tolist(), key=str)
+    color_map = {device: CHART_DEVICE_PALETTE[i % len(CHART_DEVICE_PALETTE)] for i, device in enumerate(devices)}
+    color_map[OTHER_DEVICE_LABEL] = OTHER_DEVICE_COLOR
+    return color_map
+
+# 进程内配色缓存：{数据版本: 配色}，只保留当前数据版本
+@st.cache_resource
+def get_device_color_cache():
+    return {}
+
+# 按总数量保留前 top_n 个DEVICE，其余合并为"其他"
+def collapse_device_tail(summary_data, top_n):
+    device_totals = summary_data.groupby('芯片名称/DEVICE NAME')['数量'].sum().sort_values(ascending=False)
+    if len(device_totals) <= top_n:
+        return summary_data, device_totals.index.tolist()
+    top_devices = device_totals.index[:top_n]
+    summary_data = summary_data.copy()
+    summary_data['芯片名称/DEVICE NAME'] = summary_data['芯片名称/DEVICE NAME'].where(
+        summary_data['芯片名称/DEVICE NAME'].isin(top_devices), OTHER_DEVICE_LABEL
+    )
+    summary_data = summary_data.groupby(['供应商', '环节', '芯片名称/DEVICE NAME'], as_index=False)['数量'].sum()
+    return summary_data, top_devices.tolist() + [OTHER_DEVICE_LABEL]
+
+# 单个供应商的数据图：DEVICE×环节 透视后一次性完成缩放，批量添加曲线
+def build_chart_figure(summary_data, supplier, color_map, top_n=CHART_TOP_N_DEVICES):
+    summary_data, device_list = collapse_device_tail(summary_data, top_n)
+    pivot = summary_data.pivot_table(index='芯片名称/DEVICE NAME', columns='环节', values='数量', aggfunc='sum')
+    pivot = pivot.reindex(index=[d for d in device_list if d in pivot.index], columns=sorted(pivot.columns))
+    quantities = pivot.to_numpy(dtype=float)
+    scaled = nonlinear_scale(quantities)
+    categories = pivot.columns.tolist()
+
+    traces = []
+    for device_idx in np.flatnonzero(~np.isnan(quantities).all(axis=1)):
+        device = pivot.index[device_idx]
+        traces.append(dict(
+            type='bar',
+            x=categories,
+            y=scaled[device_idx],
+            name=device,
+            text=[None if np.isnan(q) else q for q in quantities[device_idx].tolist()],
+            marker_color=color_map[device]
+        ))
+
+    current_center = (len(categories) - 1) / 2.0
+    fig = go.Figure(data=traces)
+    fig.update_xaxes(title="", tickfont=dict(size=14, color='black', weight='bold'), tickangle=0, showgrid=False,
+                     range=[current_center - CHART_X_SPAN / 2.0, current_center + CHART_X_SPAN / 2.0])
+    fig.update_yaxes(title="", showticklabels=False, showgrid=False)
+    fig.update_layout(
+        template=CHART_TEMPLATE,
+        title=dict(text=supplier, x=0.5, xanchor='center', font=dict(size=16, color='black', weight='bold')),
+        barmode='stack',
+        height=700,
+        legend=dict(
+            title="DEVICE型号",
+            title_font=dict(size=11, weight='bold'),
+            font=dict(size=10),
+            orientation="v",
+            yanchor="top",
+            y=1,
+            xanchor="left",
+            x=1.02
+        ),
+        margin=dict(l=20, r=120, t=60, b=40),
+        plot_bgcolor='white',
+        hovermode='closest'
+    )
+    return fig
+
+# 按筛选条件汇总数据图数据
+def get_chart_summary(data, filters):
+    chart_data = data.dropna(subset=['数量'])
     chart_data = chart_data[chart_data['数量'] > 0]
     chart_data['芯片名称/DEVICE NAME'] = chart_data['芯片名称/DEVICE NAME'].fillna("未知DEVICE")
     
-    if supplier != "全部":
-        chart_data = chart_data[chart_data['供应商'] == supplier]
-    if process != "全部":
-        chart_data = chart_data[chart_data['环节'] == process]
-    if selected_wafer != ["全部"] and len(selected_wafer) > 0:
-        chart_data = chart_data[chart_data['晶圆型号/WAFER DEVICE'].isin(selected_wafer)]
-    if selected_device != ["全部"] and len(selected_device) > 0:
-        chart_data = chart_data[chart_data['芯片名称/DEVICE NAME'].isin(selected_device)]
-    
-    if chart_data.empty:
-        st.info("暂无符合筛选条件的数据图数据")
-        return
-    
-    summary_data = chart_data.groupby(['供应商', '环节', '芯片名称/DEVICE NAME'])['数量'].sum().reset_index()
-    display_suppliers = summary_data['供应商'].unique().tolist() if supplier == "全部" else [supplier]
-    device_list = summary_data['芯片名称/DEVICE NAME'].unique().tolist()
+    if filters["supplier"] != "全部":
+        chart_data = chart_data[chart_data['供应商'] == filters["supplier"]]
+    if filters["process"] != "全部":
+        chart_data = chart_data[chart_data['环节'] == filters["process"]]
+    if filters["wafer"] != ["全部"] and len(filters["wafer"]) > 0:
+        chart_data = chart_data[chart_data['晶圆型号/WAFER DEVICE'].isin(filters["wafer"])]
+    if filters["device"] != ["全部"] and len(filters["device"]) > 0:
+        chart_data = chart_data[chart_data['芯片名称/DEVICE NAME'].isin(filters["device"])]
     
-    soft_palette = px.colors.qualitative.Pastel1 + px.colors.qualitative.Pastel2 + px.colors.qualitative.Set3
-    device_color_map = {device: soft_palette[i % len(soft_palette)] for i, device in enumerate(device_list)}
-
-    max_process_count = 0
-    for s in display_suppliers:
-        temp_data = summary_data[summary_data['供应商'] == s]
-        if not temp_data.empty:
-            count = len(temp_data['环节'].unique())
-            if count > max_process_count:
-                max_process_count = count
-    
-    global_span = max(max_process_count, 2.4) 
-    cols = st.columns(2)
+    return chart_data.groupby(['供应商', '环节', '芯片名称/DEVICE NAME'])['数量'].sum().reset_index()
 
+# 数据图区域：每个供应商一个占位，解析完成前显示读取状态
+def create_chart_placeholders():
+    supplier = st.session_state.get("table_supplier_select", "全部")
+    display_suppliers = ['禾芯', '日荣', '弘润', '伟测'] if supplier == "全部" else [supplier]
+    top_n = st.number_input("单独显示的DEVICE数量（其余合并为“其他”）", min_value=1, max_value=500, value=CHART_TOP_N_DEVICES, step=1, key="chart_top_n")
+    cols = st.columns(2)
+    chart_placeholders = {}
     for idx, s in enumerate(display_suppliers):
-        col_to_use = cols[idx % 2]
-        with col_to_use:
-            s_data = summary_data[summary_data['供应商'] == s].copy()
-            if s_data.empty:
-                st.info(f"{s}暂无数据")
-                continue
-            
-            s_data['scaled_quantity'] = nonlinear_scale(s_data['数量'].values)
-            current_categories = sorted(s_data['环节'].unique().tolist())
-            n_bars = len(current_categories)
-            
-            current_center = (n_bars - 1) / 2.0 if n_bars > 0 else 0
-            half_span = global_span / 2.0
-            x_range_min = current_center - half_span
-            x_range_max = current_center + half_span
-            
-            fig = go.Figure()
-            for device in device_list:
-                device_data = s_data[s_data['芯片名称/DEVICE NAME'] == device]
-                if not device_data.empty:
-                    fig.add_trace(go.Bar(
-                        x=device_data['环节'],
-                        y=device_data['scaled_quantity'],
-                        name=device,
-                        text=device_data['数量'],
-                        textposition='outside',
-                        textfont=dict(size=12, color='black', weight='bold'),
-                        marker=dict(
-                            color=device_color_map[device], 
-                            line=dict(color='black', width=0.5)
-                        ),
-                        hovertemplate=f"<b>DEVICE:</b> {device}<br><b>环节:</b> %{{x}}<br><b>真实数量:</b> %{{text}}<extra></extra>",
-                        width=0.8
-                    ))
-            
-            fig.update_layout(
-                title=dict(
-                    text=f'{s}',
-                    x=0.5,
-                    xanchor='center',
-                    xref='paper', 
-                    font=dict(size=16, color='black', weight='bold')
-                ),
-                barmode='stack',
-                height=700,
-                xaxis=dict(
-                    title="",
-                    tickfont=dict(size=14, color='black', weight='bold'),
-                    tickangle=0,
-                    showgrid=False,
-                    range=[x_range_min, x_range_max]
-                ),
-                yaxis=dict(
-                    title="",
-                    showticklabels=False,
-                    showgrid=False
-                ),
-                legend=dict(
-                    title="DEVICE型号",
-                    title_font=dict(size=11, weight='bold'),
-                    font=dict(size=10),
-                    orientation="v",
-                    yanchor="top",
-                    y=1,
-                    xanchor="right",
-                    x=1.2
-                ),
-                margin=dict(l=20, r=120, t=60, b=40),
-                plot_bgcolor='white',
-                hovermode='closest'
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
+        with cols[idx % 2]:
+            chart_placeholders[s] = st.empty()
+            chart_placeholders[s].info(f"⏳ {s}数据读取中...")
+    return chart_placeholders, int(top_n)
+
+# 尚无全量数据的配色时，按本供应商的DEVICE临时配色
+def build_supplier_chart(supplier, supplier_data, filters, top_n, color_map=None):
+    summary_data = get_chart_summary(supplier_data, filters) if not supplier_data.empty else pd.DataFrame()
+    if summary_data.empty:
+        return None
+    if color_map is None:
+        color_map = build_device_color_map(summary_data)
+    return build_chart_figure(summary_data, supplier, color_map, top_n)
+
+# 已预计算的视图直接使用缓存中的图表
+def render_supplier_chart(placeholder, supplier, supplier_data, filters, top_n, cached_view=None, color_map=None):
+    if cached_view is not None and top_n == CHART_TOP_N_DEVICES:
+        fig = cached_view["figures"].get(supplier)
+    else:
+        fig = build_supplier_chart(supplier, supplier_data, filters, top_n, color_map)
+    if fig is None:
+        placeholder.info(f"{supplier}暂无符合筛选条件的数据图数据")
+        return
+    placeholder.plotly_chart(fig, use_container_width=True)
 
 # ---------------------- 数据表模块 ----------------------
-def render_data_tables(all_data):
+# 筛选条件与侧边栏控件的对应关系
+TABLE_FILTER_KEYS = {
+    "supplier": "table_supplier_select",
+    "process": "table_process_select",
+    "wafer": "table_wafer_select",
+    "device": "table_device_select",
+    "lots": "table_lot_select",
+    "rirong_process": "table_rirong_process_select"
+}
+TABLE_FILTER_DEFAULTS = {
+    "supplier": "全部",
+    "process": "全部",
+    "wafer": ["全部"],
+    "device": ["全部"],
+    "lots": ["全部"],
+    "rirong_process": "全部"
+}
+
+# 读取当前侧边栏筛选条件
+def get_table_filters():
+    filters = {name: st.session_state.get(key, TABLE_FILTER_DEFAULTS[name]) for name, key in TABLE_FILTER_KEYS.items()}
+    if not (filters["supplier"] == "日荣" and filters["process"] == "ASY_加工中"):
+        filters["rirong_process"] = "全部"
+    return filters
+
+def filter_table_data(all_data, filters):
+    filtered_data = all_data.copy()
+    if filters["supplier"] != "全部":
+        filtered_data = filtered_data[filtered_data['供应商'] == filters["supplier"]]
+    if filters["process"] != "全部":
+        filtered_data = filtered_data[filtered_data['环节'] == filters["process"]]
+    if filters["wafer"] != ["全部"] and len(filters["wafer"]) > 0:
+        filtered_data = filtered_data[filtered_data['晶圆型号/WAFER DEVICE'].isin(filters["wafer"])]
+    if filters["device"] != ["全部"] and len(filters["device"]) > 0:
+        filtered_data = filtered_data[filtered_data['芯片名称/DEVICE NAME'].isin(filters["device"])]
+    if "全部" not in filters["lots"] and filters["lots"]:
+        filtered_data = filtered_data[filtered_data['批次号/LOT NO'].isin(filters["lots"])]
+    if filters["rirong_process"] != "全部" and filters["supplier"] == "日荣" and filters["process"] == "ASY_加工中":
+        filtered_data = filtered_data[filtered_data['当前环节'] == filters["rirong_process"]]
+    return filtered_data
+
+# 生成筛选后数据表及日荣环节统计（无统计时为 None）
+def build_table_view(all_data, filters):
+    filtered_data = filter_table_data(all_data, filters)
+    target_columns = get_target_columns(filters["supplier"], filters["process"])
+    if filtered_data.empty:
+        display_data = pd.DataFrame(columns=target_columns)
+    else:
+        display_data = filtered_data.reindex(columns=target_columns).reset_index(drop=True)
+        display_data.insert(0, "序号", range(1, len(display_data) + 1))
+
+    process_stats = None
+    if filters["supplier"] == "日荣" and filters["process"] == "ASY_加工中" and not filtered_data.empty and '当前环节' in filtered_data.columns:
+        process_stats = filtered_data.groupby('当前环节')['当前数量/WIP QTY'].sum().reset_index()
+        process_stats.columns = ['环节', '总数量']
+        process_stats = process_stats.sort_values('总数量', ascending=False)
+    return display_data, process_stats
+
+# 筛选控件的值由 session_state 提供：首次使用默认值；保存的视图中的选项可能已不在当前数据中，创建控件前剔除
+# 只在值需要变化时写入，避免 Streamlit 提示控件值被重复设置
+def sanitize_filter_state(name, options, multi):
+    key = TABLE_FILTER_KEYS[name]
+    default = TABLE_FILTER_DEFAULTS[name]
+    if key not in st.session_state:
+        st.session_state[key] = list(default) if multi else default
+        return
+    if multi:
+        cleaned = [v for v in st.session_state[key] if v in options] or list(default)
+    else:
+        cleaned = st.session_state[key] if st.session_state[key] in options else default
+    if cleaned != st.session_state[key]:
+        st.session_state[key] = cleaned
+
+def render_data_tables(all_data, data_version=None):
     st.subheader("📋 数据表展示")
+    render_saved_view_selector()
     st.sidebar.header("🔍 数据筛选")
     
     all_suppliers = ['禾芯', '日荣', '弘润', '伟测']
     supplier_list = ["全部"] + all_suppliers
+    sanitize_filter_state("supplier", supplier_list, multi=False)
     supplier = st.sidebar.selectbox("选择供应商", supplier_list, key="table_supplier_select")
     
     process_list = ["全部"] + supplier_process_map[supplier]
+    sanitize_filter_state("process", process_list, multi=False)
     process = st.sidebar.selectbox("选择环节", process_list, key="table_process_select")
     
     wafer_types = sorted(all_data['晶圆型号/WAFER DEVICE'].dropna().unique().tolist())
-    selected_wafer = st.sidebar.multiselect("选择晶圆型号", ["全部"] + wafer_types, default=["全部"], key="table_wafer_select")
+    sanitize_filter_state("wafer", ["全部"] + wafer_types, multi=True)
+    selected_wafer = st.sidebar.multiselect("选择晶圆型号", ["全部"] + wafer_types, key="table_wafer_select")
     
     device_names = sorted(all_data['芯片名称/DEVICE NAME'].dropna().unique().tolist())
-    selected_device = st.sidebar.multiselect("选择芯片名称", ["全部"] + device_names, default=["全部"], key="table_device_select")
+    sanitize_filter_state("device", ["全部"] + device_names, multi=True)
+    selected_device = st.sidebar.multiselect("选择芯片名称", ["全部"] + device_names, key="table_device_select")
     
     all_lot_numbers = all_data['批次号/LOT NO'].dropna().unique().tolist()
     all_lot_numbers = sorted([lot for lot in all_lot_numbers if lot])
     lot_number_list = ["全部"] + all_lot_numbers
-    selected_lots = st.sidebar.multiselect("选择批次号（可多选）", lot_number_list, default=["全部"], key="table_lot_select")
+    sanitize_filter_state("lots", lot_number_list, multi=True)
+    selected_lots = st.sidebar.multiselect("选择批次号（可多选）", lot_number_list, key="table_lot_select")
     
-    selected_process = "全部"
     if supplier == "日荣" and process == "ASY_加工中":
         all_processes = all_data[all_data['供应商'] == '日荣']['当前环节'].dropna().unique().tolist()
         all_processes = sorted([p for p in all_processes if p])
         process_list = ["全部"] + all_processes
-        selected_process = st.sidebar.selectbox("选择当前环节", process_list, key="table_rirong_process_select")
+        sanitize_filter_state("rirong_process", process_list, multi=False)
+        st.sidebar.selectbox("选择当前环节", process_list, key="table_rirong_process_select")
 
-    filtered_data = all_data.copy()
-    if supplier != "全部":
-        filtered_data = filtered_data[filtered_data['供应商'] == supplier]
-    if process != "全部":
-        filtered_data = filtered_data[filtered_data['环节'] == process]
-    if selected_wafer != ["全部"] and len(selected_wafer) > 0:
-        filtered_data = filtered_data[filtered_data['晶圆型号/WAFER DEVICE'].isin(selected_wafer)]
-    if selected_device != ["全部"] and len(selected_device) > 0:
-        filtered_data = filtered_data[filtered_data['芯片名称/DEVICE NAME'].isin(selected_device)]
-    if "全部" not in selected_lots and selected_lots:
-        filtered_data = filtered_data[filtered_data['批次号/LOT NO'].isin(selected_lots)]
-    if selected_process != "全部" and supplier == "日荣" and process == "ASY_加工中":
-        filtered_data = filtered_data[filtered_data['当前环节'] == selected_process]
+    filters = get_table_filters()
+    render_saved_view_editor(all_data, data_version, filters)
 
-    target_columns = get_target_columns(supplier, process)
-    if filtered_data.empty:
-        display_data = pd.DataFrame(columns=target_columns)
+    cached_view = get_cached_saved_view(data_version, filters)
+    if cached_view is not None:
+        display_data, process_stats = cached_view["display_data"], cached_view["process_stats"]
     else:
-        display_data = filtered_data.reindex(columns=target_columns).reset_index(drop=True)
-        display_data.insert(0, "序号", range(1, len(display_data) + 1))
+        display_data, process_stats = build_table_view(all_data, filters)
     
     st.write("### 筛选后数据")
     st.dataframe(display_data, use_container_width=True, hide_index=True)
@@ -683,11 +1120,8 @@ def render_data_tables(all_data):
             mime="text/csv"
         )
     
-    if supplier == "日荣" and process == "ASY_加工中" and not filtered_data.empty and '当前环节' in filtered_data.columns:
+    if process_stats is not None:
         st.write("### 日荣环节统计")
-        process_stats = filtered_data.groupby('当前环节')['当前数量/WIP QTY'].sum().reset_index()
-        process_stats.columns = ['环节', '总数量']
-        process_stats = process_stats.sort_values('总数量', ascending=False)
         st.dataframe(process_stats, use_container_width=True, hide_index=True)
     
     with st.expander("查看全部原始数据", expanded=False):
@@ -715,21 +1149,671 @@ def render_data_tables(all_data):
         else:
             st.info(f"未找到批次号 {', '.join(selected_lots)} 的相关数据")
 
+# ---------------------- 保存的视图 ----------------------
+# 获取保存的视图文件路径：{用户名: {视图名: 筛选条件}}
+def get_saved_views_file_path():
+    app_data_dir = Path.home() / ".chip_production_dashboard"
+    app_data_dir.mkdir(exist_ok=True)
+    return app_data_dir / "saved_views.json"
+
+def load_saved_views():
+    views_file = get_saved_views_file_path()
+    if not views_file.exists():
+        return {}
+    try:
+        with open(views_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"加载保存的视图失败: {e}")
+        return {}
+
+def save_saved_views(views_data):
+    try:
+        with open(get_saved_views_file_path(), 'w', encoding='utf-8') as f:
+            json.dump(views_data, f, ensure_ascii=False, indent=2)
+        return True
+    except Exception as e:
+        print(f"保存视图失败: {e}")
+        return False
+
+def get_view_signature(filters):
+    return json.dumps(filters, ensure_ascii=False, sort_keys=True)
+
+# 进程内视图缓存：只保存当前数据版本的预计算结果
+@st.cache_resource
+def get_saved_view_cache():
+    return {"data_version": None, "views": {}, "lock": threading.Lock()}
+
+def get_cached_saved_view(data_version, filters):
+    if data_version is None:
+        return None
+    cache = get_saved_view_cache()
+    with cache["lock"]:
+        if cache["data_version"] != data_version:
+            return None
+        return cache["views"].get(get_view_signature(filters))
+
+# 预计算单个视图：筛选后数据表、日荣环节统计及各供应商数据图
+def compute_saved_view(all_data, filters, color_map):
+    display_data, process_stats = build_table_view(all_data, filters)
+    figures = {}
+    for s in ['禾芯', '日荣', '弘润', '伟测']:
+        fig = build_supplier_chart(s, all_data[all_data['供应商'] == s], filters, CHART_TOP_N_DEVICES, color_map)
+        if fig is not None:
+            figures[s] = fig
+    return {"display_data": display_data, "process_stats": process_stats, "figures": figures}
+
+def warm_saved_views(all_data, data_version, views):
+    cache = get_saved_view_cache()
+    color_map = build_device_color_map(all_data)
+    for filters in views:
+        signature = get_view_signature(filters)
+        with cache["lock"]:
+            if cache["data_version"] != data_version:
+                return
+            if signature in cache["views"]:
+                continue
+        try:
+            view_result = compute_saved_view(all_data, filters, color_map)
+        except Exception as e:
+            print(f"视图预计算失败: {e}")
+            continue
+        with cache["lock"]:
+            if cache["data_version"] == data_version:
+                cache["views"][signature] = view_result
+
+# 在后台线程中预计算视图；数据版本变化时清空旧结果并预计算所有用户的视图
+def schedule_saved_view_warmup(all_data, data_version, views=None):
+    cache = get_saved_view_cache()
+    with cache["lock"]:
+        if views is None:
+            if cache["data_version"] == data_version:
+                return
+            cache["data_version"] = data_version
+            cache["views"] = {}
+            views = [filters for user_views in load_saved_views().values() for filters in user_views.values()]
+        elif cache["data_version"] != data_version:
+            return
+    threading.Thread(target=warm_saved_views, args=(all_data, data_version, views), daemon=True).start()
+
+def apply_saved_view(filters):
+    for name, key in TABLE_FILTER_KEYS.items():
+        st.session_state[key] = filters.get(name, TABLE_FILTER_DEFAULTS[name])
+
+def delete_saved_view(username, view_name):
+    views_data = load_saved_views()
+    if view_name in views_data.get(username, {}):
+        del views_data[username][view_name]
+        save_saved_views(views_data)
+
+def save_current_view(username, all_data, data_version, filters):
+    view_name = st.session_state.get("saved_view_name", "").strip()
+    if not view_name:
+        return
+    views_data = load_saved_views()
+    views_data.setdefault(username, {})[view_name] = filters
+    if save_saved_views(views_data):
+        st.session_state.saved_view_name = ""
+        schedule_saved_view_warmup(all_data, data_version, [filters])
+
+def render_saved_view_selector():
+    user_views = load_saved_views().get(st.session_state.username, {})
+    if not user_views:
+        return
+    st.sidebar.header("💾 保存的视图")
+    view_name = st.sidebar.selectbox("选择视图", list(user_views), key="saved_view_select")
+    col1, col2 = st.sidebar.columns(2)
+    with col1:
+        st.button("应用视图", on_click=apply_saved_view, args=(user_views[view_name],), use_container_width=True)
+    with col2:
+        st.button("删除视图", on_click=delete_saved_view, args=(st.session_state.username, view_name), use_container_width=True)
+
+def render_saved_view_editor(all_data, data_version, filters):
+    st.sidebar.text_input("视图名称", placeholder="输入名称以保存当前筛选", key="saved_view_name")
+    st.sidebar.button("💾 保存当前筛选为视图", on_click=save_current_view, args=(st.session_state.username, all_data, data_version, filters), use_container_width=True)
+
+# ---------------------- 透视分析模块 ----------------------
+# 可选的透视维度
+PIVOT_DIMENSIONS = [
+    '供应商', '环节', '芯片名称/DEVICE NAME', '晶圆型号/WAFER DEVICE', '批次号/LOT NO', '当前环节',
+    '封装周码/DATE CODE', 'BIN别/BIN', '站别/Status', '测试类型/FT\\RT', '测试订单号/FT PO', '封装订单号/ASY PO'
+]
+PIVOT_EMPTY_LABEL = "（空）"
+# 列维度组合过多时表格不可读，超过上限不展开
+PIVOT_MAX_COLUMNS = 200
+
+# 维度列统一转为字符串分类类型；整数值的浮点数去掉 ".0"，避免同一周码出现 "2432" 和 "2432.0"
+# 只对去重后的取值做字符串处理，再按编码映射回整列
+def to_pivot_category(series):
+    codes, uniques = pd.factorize(series)
+    labels = pd.Series(uniques, dtype=object).astype('string').str.strip().str.replace(r'^(-?\d+)\.0+$', r'\1', regex=True)
+    labels = labels.replace('', pd.NA).fillna(PIVOT_EMPTY_LABEL).tolist() + [PIVOT_EMPTY_LABEL]
+    label_codes, categories = pd.factorize(pd.Series(labels), sort=True)
+    # 空值（编码 -1）取追加在末尾的"（空）"
+    return pd.Series(pd.Categorical.from_codes(label_codes[codes], categories=categories), index=series.index)
+
+# 分类列存储的透视数据
+def build_pivot_frame(all_data):
+    pivot_frame = pd.DataFrame({dim: to_pivot_category(all_data[dim]) for dim in PIVOT_DIMENSIONS if dim in all_data.columns})
+    pivot_frame['数量'] = pd.to_numeric(all_data['数量'], errors='coerce')
+    return pivot_frame
+
+# 每个数据版本只构建一次透视数据
+@st.cache_resource(max_entries=2)
+def get_pivot_frame(_all_data, data_version):
+    return build_pivot_frame(_all_data)
+
+def pivot_frame_to_table(pivot_frame, rows, cols, agg):
+    grouped = pivot_frame.groupby(list(rows) + list(cols), observed=True, sort=True)['数量']
+    result = grouped.sum() if agg == "求和" else grouped.count()
+    value_name = f"数量{agg}"
+    if not cols:
+        return result.rename(value_name).reset_index()
+    column_keys = result.index.droplevel(list(rows)).unique() if rows else result.index.unique()
+    if len(column_keys) > PIVOT_MAX_COLUMNS:
+        return None
+    if rows:
+        table = result.unstack(list(cols), fill_value=0)
+    else:
+        table = result.to_frame().T
+    if isinstance(table.columns, pd.MultiIndex):
+        table.columns = [" / ".join(map(str, key)) for key in table.columns]
+    else:
+        table.columns = [str(key) for key in table.columns]
+    table['合计'] = table.sum(axis=1)
+    return table.reset_index() if rows else table.reset_index(drop=True)
+
+# 按查询签名（数据版本、行列维度、统计方式）缓存透视结果
+@st.cache_data(show_spinner=False, max_entries=64)
+def compute_pivot(_pivot_frame, data_version, rows, cols, agg):
+    return pivot_frame_to_table(_pivot_frame, rows, cols, agg)
+
+def render_pivot_table(all_data, data_version):
+    st.subheader("🧮 透视分析")
+    available_dims = [dim for dim in PIVOT_DIMENSIONS if dim in all_data.columns]
+    col1, col2, col3 = st.columns([3, 3, 1])
+    with col1:
+        rows = st.multiselect("行维度", available_dims, default=['供应商', '环节'], key="pivot_rows")
+    with col2:
+        cols = st.multiselect("列维度", [dim for dim in available_dims if dim not in rows], key="pivot_cols")
+    with col3:
+        agg = st.radio("统计方式", ["求和", "计数"], key="pivot_agg")
+
+    if not rows and not cols:
+        st.info("请至少选择一个行维度或列维度")
+        return
+
+    # 本次解析有文件出错时数据不完整，不写入缓存（data_version 为 None）
+    if data_version is None:
+        pivot_result = pivot_frame_to_table(build_pivot_frame(all_data), rows, cols, agg)
+    else:
+        pivot_frame = get_pivot_frame(all_data, data_version)
+        pivot_result = compute_pivot(pivot_frame, data_version, tuple(rows), tuple(cols), agg)
+    if pivot_result is None:
+        st.warning(f"列维度组合超过 {PIVOT_MAX_COLUMNS} 个，请减少列维度或改为行维度")
+        return
+    st.dataframe(pivot_result, use_container_width=True, hide_index=True)
+
+    if check_permission(st.session_state.username, "export") and not pivot_result.empty:
+        st.download_button(
+            label="📥 导出透视结果CSV",
+            data=pivot_result.to_csv(index=False).encode('utf-8'),
+            file_name=f"生产数据_透视_{time.strftime('%Y%m%d_%H%M%S')}.csv",
+            mime="text/csv"
+        )
+
+# ---------------------- 快照对比模块 ----------------------
+# 快照保留天数
+SNAPSHOT_KEEP_DAYS = 30
+# 对比主键：同一供应商、同一环节下的同一批次视为同一条记录
+DIFF_KEY_COLUMNS = ['供应商', '环节', '批次号/LOT NO']
+DIFF_TYPES = ["新增", "移除", "环节变化", "数量变化"]
+
+# 获取快照存放目录
+def get_snapshot_dir():
+    snapshot_dir = Path.home() / ".chip_production_dashboard" / "snapshots"
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    return snapshot_dir
+
+def list_snapshots():
+    return sorted(get_snapshot_dir().glob("snapshot_*.pkl"))
+
+def get_snapshot_label(snapshot_file):
+    return snapshot_file.stem.replace("snapshot_", "")
+
+# 快照说明：{快照日期: {"incomplete_suppliers": [有文件被拒绝或读取失败的供应商]}}
+def load_snapshot_meta():
+    meta_file = get_snapshot_dir() / "snapshot_meta.json"
+    if not meta_file.exists():
+        return {}
+    try:
+        with open(meta_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"加载快照说明失败: {e}")
+        return {}
+
+def get_incomplete_suppliers(snapshot_meta, label):
+    return snapshot_meta.get(label, {}).get("incomplete_suppliers", [])
+
+# 保存当日快照：源文件有更新，或当日快照中数据不完整的供应商本次已能完整读取时覆盖当日快照，并清理过期快照
+# 数据不完整的供应商记录在快照说明中，对比时不参与，避免其批次被误报为移除
+def save_snapshot(all_data, incomplete_suppliers):
+    label = time.strftime('%Y%m%d')
+    snapshot_file = get_snapshot_dir() / f"snapshot_{label}.pkl"
+    source_files = [os.path.join(folder_path, f) for f in os.listdir(folder_path)]
+    source_mtime = max((os.path.getmtime(f) for f in source_files if os.path.isfile(f)), default=0)
+    snapshot_meta = load_snapshot_meta()
+    incomplete_suppliers = sorted(incomplete_suppliers)
+    saved_incomplete = set(get_incomplete_suppliers(snapshot_meta, label))
+    if snapshot_file.exists() and snapshot_file.stat().st_mtime >= source_mtime and not set(incomplete_suppliers) < saved_incomplete:
+        return
+    try:
+        tmp_file = snapshot_file.with_suffix(".tmp")
+        all_data.to_pickle(tmp_file)
+        os.replace(tmp_file, snapshot_file)
+        for old_file in list_snapshots()[:-SNAPSHOT_KEEP_DAYS]:
+            old_file.unlink()
+        kept_labels = {get_snapshot_label(f) for f in list_snapshots()}
+        snapshot_meta = {key: value for key, value in snapshot_meta.items() if key in kept_labels}
+        snapshot_meta[label] = {"incomplete_suppliers": incomplete_suppliers}
+        meta_file = get_snapshot_dir() / "snapshot_meta.json"
+        tmp_meta_file = meta_file.with_suffix(".tmp")
+        with open(tmp_meta_file, 'w', encoding='utf-8') as f:
+            json.dump(snapshot_meta, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_meta_file, meta_file)
+    except Exception as e:
+        print(f"保存数据快照失败: {e}")
+
+def get_missing_lot_mask(df):
+    lots = df['批次号/LOT NO'] if '批次号/LOT NO' in df.columns else pd.Series('', index=df.index)
+    return lots.fillna('').astype(str).str.strip() == ''
+
+# 缺少批次号的行无法按批次对比，返回 (行数, 数量合计) 以便提示
+def count_missing_lot_rows(df):
+    quantities = pd.to_numeric(df['数量'], errors='coerce') if '数量' in df.columns else pd.Series(np.nan, index=df.index)
+    # 无数量的占位行（如日荣无文件时）不计入
+    missing = get_missing_lot_mask(df) & quantities.notna()
+    return int(missing.sum()), float(quantities[missing].sum())
+
+# 按对比主键归并快照：同一批次多行（如不同BIN）合计数量；缺少批次号的行不参与对比
+def prepare_diff_frame(df):
+    frame = df.reindex(columns=DIFF_KEY_COLUMNS + ['芯片名称/DEVICE NAME', '当前环节', '数量'])
+    frame[DIFF_KEY_COLUMNS] = frame[DIFF_KEY_COLUMNS].fillna('').astype(str)
+    frame = frame[frame['批次号/LOT NO'].str.strip() != '']
+    frame['当前环节'] = frame['当前环节'].fillna('').astype(str)
+    frame['数量'] = pd.to_numeric(frame['数量'], errors='coerce').fillna(0)
+    return frame.groupby(DIFF_KEY_COLUMNS, sort=False, as_index=False).agg(
+        {'芯片名称/DEVICE NAME': 'first', '当前环节': 'first', '数量': 'sum'}
+    )
+
+def diff_snapshots(old_data, new_data):
+    return diff_prepared_frames(prepare_diff_frame(old_data), prepare_diff_frame(new_data))
+
+def diff_prepared_frames(old_frame, new_frame):
+    merged = pd.merge(old_frame, new_frame, on=DIFF_KEY_COLUMNS, how='outer', suffixes=('_旧', '_新'), indicator=True)
+    conditions = [
+        merged['_merge'] == 'right_only',
+        merged['_merge'] == 'left_only',
+        merged['当前环节_旧'] != merged['当前环节_新'],
+        merged['数量_旧'] != merged['数量_新']
+    ]
+    merged['变化类型'] = np.select(conditions, DIFF_TYPES, default='')
+    merged = merged[merged['变化类型'] != '']
+    diff = pd.DataFrame({
+        '变化类型': merged['变化类型'],
+        '供应商': merged['供应商'],
+        '环节': merged['环节'],
+        '批次号/LOT NO': merged['批次号/LOT NO'],
+        '芯片名称/DEVICE NAME': merged['芯片名称/DEVICE NAME_新'].fillna(merged['芯片名称/DEVICE NAME_旧']),
+        '原当前环节': merged['当前环节_旧'],
+        '新当前环节': merged['当前环节_新'],
+        '原数量': merged['数量_旧'],
+        '新数量': merged['数量_新'],
+        '数量差': merged['数量_新'].fillna(0) - merged['数量_旧'].fillna(0)
+    })
+    diff['变化类型'] = pd.Categorical(diff['变化类型'], categories=DIFF_TYPES, ordered=True)
+    return diff.sort_values(['变化类型', '供应商', '环节', '批次号/LOT NO']).reset_index(drop=True)
+
+# 按快照对缓存对比结果，快照文件更新（mtime变化）后自动失效
+@st.cache_data(show_spinner=False, max_entries=16)
+def compute_snapshot_diff(old_file, new_file, old_mtime, new_mtime, excluded_suppliers):
+    old_data, new_data = pd.read_pickle(old_file), pd.read_pickle(new_file)
+    old_data = old_data[~old_data['供应商'].isin(excluded_suppliers)]
+    new_data = new_data[~new_data['供应商'].isin(excluded_suppliers)]
+    return diff_snapshots(old_data, new_data), count_missing_lot_rows(old_data), count_missing_lot_rows(new_data)
+
+def render_snapshot_diff():
+    st.subheader("🔄 数据变化")
+    snapshots = list_snapshots()
+    if len(snapshots) < 2:
+        st.info("快照不足两份，暂无法对比（每天打开看板时会自动保存当日快照）")
+        return
+
+    labels = [get_snapshot_label(f) for f in snapshots]
+    col1, col2 = st.columns(2)
+    with col1:
+        old_label = st.selectbox("对比基准快照", labels, index=len(labels) - 2, key="diff_old_select")
+    with col2:
+        new_label = st.selectbox("对比目标快照", labels, index=len(labels) - 1, key="diff_new_select")
+    if old_label == new_label:
+        st.info("请选择两份不同的快照")
+        return
+
+    old_file = snapshots[labels.index(old_label)]
+    new_file = snapshots[labels.index(new_label)]
+    snapshot_meta = load_snapshot_meta()
+    excluded_suppliers = set()
+    for label in [old_label, new_label]:
+        incomplete_suppliers = get_incomplete_suppliers(snapshot_meta, label)
+        if incomplete_suppliers:
+            st.warning(f"快照 {label} 保存时{'、'.join(incomplete_suppliers)}有文件被拒绝或读取失败，数据不完整，该供应商未参与本次对比")
+            excluded_suppliers.update(incomplete_suppliers)
+    diff, old_missing, new_missing = compute_snapshot_diff(
+        str(old_file), str(new_file), old_file.stat().st_mtime, new_file.stat().st_mtime, tuple(sorted(excluded_suppliers))
+    )
+    for label, (missing_rows, missing_qty) in [(old_label, old_missing), (new_label, new_missing)]:
+        if missing_rows:
+            st.warning(f"快照 {label} 中有 {missing_rows} 行缺少批次号（数量合计 {missing_qty:g}），未参与对比")
+
+    type_counts = diff['变化类型'].value_counts()
+    metric_cols = st.columns(len(DIFF_TYPES))
+    for col, diff_type in zip(metric_cols, DIFF_TYPES):
+        col.metric(diff_type, int(type_counts.get(diff_type, 0)))
+
+    selected_types = st.multiselect("变化类型", DIFF_TYPES, default=DIFF_TYPES, key="diff_type_select")
+    display_diff = diff[diff['变化类型'].isin(selected_types)].reset_index(drop=True)
+    if display_diff.empty:
+        st.info(f"{old_label} → {new_label} 无符合条件的变化")
+        return
+    display_diff.insert(0, "序号", range(1, len(display_diff) + 1))
+    st.dataframe(display_diff, use_container_width=True, hide_index=True)
+
+    if check_permission(st.session_state.username, "export"):
+        st.download_button(
+            label="📥 导出变化数据CSV",
+            data=display_diff.to_csv(index=False).encode('utf-8'),
+            file_name=f"生产数据_变化_{old_label}_{new_label}.csv",
+            mime="text/csv"
+        )
+
+# ---------------------- 阈值告警 ----------------------
+# 告警检查间隔（秒）
+ALERT_CHECK_INTERVAL = 300
+ALERT_GROUP_COLUMNS = ['供应商', '环节', '芯片名称/DEVICE NAME']
+# 看板页面显示的最近告警条数
+RECENT_ALERT_COUNT = 100
+
+# 告警目录：rules.json 为告警规则，outbox.jsonl 为待邮件转发的告警（每行一条）
+# 告警检查独立于看板页面运行，在看板目录下执行：python app.py --alert-scheduler
+# rules.json 示例：
+# {
+#   "quantity_rules": [{"name": "弘润成品库存不足", "supplier": "弘润", "process": "FT_成品库存", "device": "全部", "min_qty": 10000}],
+#   "stuck_rules": [{"name": "日荣批次停滞", "supplier": "日荣", "process": "ASY_加工中", "max_days": 3}]
+# }
+def get_alert_dir():
+    alert_dir = Path.home() / ".chip_production_dashboard" / "alerts"
+    alert_dir.mkdir(parents=True, exist_ok=True)
+    return alert_dir
+
+def is_alert_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+# 逐条校验规则：数量规则至少需要 min_qty 或 max_qty 之一，停滞规则需要 max_days；不合格的规则跳过，不影响其他规则
+def validate_alert_rules(rules, required_fields, rule_type):
+    valid_rules = []
+    for rule in rules if isinstance(rules, list) else []:
+        if not isinstance(rule, dict):
+            print(f"告警规则格式错误，已跳过{rule_type}: {rule}")
+            continue
+        present_fields = [field for field in required_fields if field in rule]
+        if not present_fields or not all(is_alert_number(rule[field]) for field in present_fields):
+            print(f"告警规则缺少数值字段 {' 或 '.join(required_fields)}，已跳过{rule_type}: {rule}")
+            continue
+        valid_rules.append(rule)
+    return valid_rules
+
+def load_alert_rules():
+    rules_file = get_alert_dir() / "rules.json"
+    if not rules_file.exists():
+        return {"quantity_rules": [], "stuck_rules": []}
+    try:
+        with open(rules_file, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+        return {
+            "quantity_rules": validate_alert_rules(rules.get("quantity_rules", []), ["min_qty", "max_qty"], "数量规则"),
+            "stuck_rules": validate_alert_rules(rules.get("stuck_rules", []), ["max_days"], "停滞规则")
+        }
+    except Exception as e:
+        print(f"加载告警规则失败: {e}")
+        return {"quantity_rules": [], "stuck_rules": []}
+
+# 上次评估的状态：各供应商源文件签名、各批次所处环节及起始时间、
+# 含无批次号行的数量分组、当前处于告警中的数量规则
+def load_alert_state():
+    state_file = get_alert_dir() / "state.pkl"
+    if state_file.exists():
+        try:
+            return pd.read_pickle(state_file)
+        except Exception as e:
+            print(f"加载告警状态失败: {e}")
+    return {
+        "signatures": {},
+        "frame": pd.DataFrame(columns=DIFF_KEY_COLUMNS + ['芯片名称/DEVICE NAME', '当前环节', '数量', 'since', 'stuck_alerted']),
+        "unkeyed_groups": pd.DataFrame(columns=ALERT_GROUP_COLUMNS),
+        "violations": set()
+    }
+
+def save_alert_state(state):
+    state_file = get_alert_dir() / "state.pkl"
+    tmp_file = state_file.with_suffix(".tmp")
+    pd.to_pickle(state, tmp_file)
+    os.replace(tmp_file, state_file)
+
+def append_alerts(alerts):
+    if not alerts:
+        return
+    with open(get_alert_dir() / "outbox.jsonl", 'a', encoding='utf-8') as f:
+        for alert in alerts:
+            f.write(json.dumps(alert, ensure_ascii=False) + "\n")
+
+# 规则中 supplier/process/device 未填写或为"全部"时不限制
+def match_alert_rule(frame, rule):
+    mask = pd.Series(True, index=frame.index)
+    for field, column in [("supplier", '供应商'), ("process", '环节'), ("device", '芯片名称/DEVICE NAME')]:
+        value = rule.get(field, "全部")
+        if value != "全部":
+            mask &= frame[column] == value
+    return mask
+
+# 数量阈值按全部数据行统计（含无批次号的行）
+def get_alert_quantity_rows(data):
+    rows = pd.DataFrame({
+        '供应商': data['供应商'],
+        '环节': data['环节'],
+        '芯片名称/DEVICE NAME': data['芯片名称/DEVICE NAME'].fillna("未知DEVICE").astype(str),
+        '数量': pd.to_numeric(data['数量'], errors='coerce')
+    })
+    return rows[rows['数量'].notna()]
+
+# 数量阈值：先筛出有变化的 供应商/环节/DEVICE 组合再汇总，只对这些组合判断
+def check_quantity_rules(quantity_rows, changed_groups, rules, violations, now_text):
+    alerts = []
+    if changed_groups.empty or not rules:
+        return alerts
+    group_qty = quantity_rows.merge(changed_groups, on=ALERT_GROUP_COLUMNS).groupby(ALERT_GROUP_COLUMNS, as_index=False)['数量'].sum()
+    group_qty = changed_groups.merge(group_qty, on=ALERT_GROUP_COLUMNS, how='left').fillna({'数量': 0})
+    for rule in rules:
+        matched = group_qty[match_alert_rule(group_qty, rule)]
+        too_low = matched['数量'] < rule["min_qty"] if "min_qty" in rule else pd.Series(False, index=matched.index)
+        too_high = matched['数量'] > rule["max_qty"] if "max_qty" in rule else pd.Series(False, index=matched.index)
+        for row, is_violation in zip(matched.itertuples(index=False), (too_low | too_high).tolist()):
+            violation_key = (rule.get("name", ""),) + tuple(row[:3])
+            if not is_violation:
+                violations.discard(violation_key)
+                continue
+            if violation_key in violations:
+                continue
+            violations.add(violation_key)
+            alerts.append({
+                "time": now_text, "type": "数量阈值", "rule": rule.get("name", ""),
+                "供应商": row[0], "环节": row[1], "芯片名称/DEVICE NAME": row[2], "数量": float(row[3]),
+                "message": f"{row[0]} {row[1]} {row[2]} 数量 {row[3]:g} 超出阈值（下限 {rule.get('min_qty', '-')}，上限 {rule.get('max_qty', '-')}）"
+            })
+    return alerts
+
+# 批次停滞：批次在同一 环节/当前环节 停留超过 max_days 天，每次停滞只告警一次
+def check_stuck_rules(frame, rules, now, now_text):
+    alerts = []
+    for rule in rules:
+        stuck = match_alert_rule(frame, rule) & ~frame['stuck_alerted'] & (now - frame['since'] > rule["max_days"] * 86400)
+        for row in frame[stuck].itertuples(index=False):
+            days = (now - row.since) / 86400
+            stage = f"{row[1]}/{row[4]}" if row[4] else row[1]
+            alerts.append({
+                "time": now_text, "type": "批次停滞", "rule": rule.get("name", ""),
+                "供应商": row[0], "环节": row[1], "批次号/LOT NO": row[2], "芯片名称/DEVICE NAME": row[3], "当前环节": row[4],
+                "message": f"{row[0]} 批次 {row[2]}（{row[3]}）已在 {stage} 停留 {days:.1f} 天"
+            })
+        frame.loc[stuck, 'stuck_alerted'] = True
+    return alerts
+
+# 评估新数据：只处理源文件签名有变化的供应商；未传入的供应商（读取出错）保留上次状态
+def evaluate_alerts(supplier_data_map, signatures, now):
+    rules = load_alert_rules()
+    state = load_alert_state()
+    now_text = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))
+    frame, violations = state["frame"], state["violations"]
+    alerts = []
+    changed = [s for s in supplier_data_map if state["signatures"].get(s) != signatures[s]]
+    if changed:
+        new_data = pd.concat([supplier_data_map[s] for s in changed], ignore_index=True)
+        new_part = prepare_diff_frame(new_data)
+        old_part = frame[frame['供应商'].isin(changed)]
+        changes = diff_prepared_frames(old_part[new_part.columns], new_part)
+        # 新批次或 当前环节 变化的批次重新计时
+        new_part = new_part.merge(old_part[DIFF_KEY_COLUMNS + ['当前环节', 'since', 'stuck_alerted']], on=DIFF_KEY_COLUMNS, how='left', suffixes=('', '_旧'))
+        restart = new_part['since'].isna() | (new_part['当前环节'] != new_part['当前环节_旧'])
+        new_part['since'] = new_part['since'].where(~restart, now).astype(float)
+        new_part['stuck_alerted'] = new_part['stuck_alerted'].where(~restart, False).astype(bool)
+        frame = pd.concat([frame[~frame['供应商'].isin(changed)], new_part.drop(columns=['当前环节_旧'])], ignore_index=True)
+        frame = frame.astype({'since': float, 'stuck_alerted': bool})
+
+        # 变化组合：有批次变化的组合，以及本次或上次含无批次号行的组合
+        quantity_rows = get_alert_quantity_rows(new_data)
+        unkeyed_groups = quantity_rows.loc[get_missing_lot_mask(new_data).loc[quantity_rows.index], ALERT_GROUP_COLUMNS].drop_duplicates()
+        old_unkeyed_groups = state["unkeyed_groups"][state["unkeyed_groups"]['供应商'].isin(changed)]
+        changed_lot_groups = changes[ALERT_GROUP_COLUMNS].assign(**{'芯片名称/DEVICE NAME': changes['芯片名称/DEVICE NAME'].fillna("未知DEVICE").astype(str)})
+        changed_groups = pd.concat([changed_lot_groups, unkeyed_groups, old_unkeyed_groups], ignore_index=True).drop_duplicates()
+        alerts += check_quantity_rules(quantity_rows, changed_groups, rules["quantity_rules"], violations, now_text)
+
+        state["unkeyed_groups"] = pd.concat([state["unkeyed_groups"][~state["unkeyed_groups"]['供应商'].isin(changed)], unkeyed_groups], ignore_index=True)
+        state["signatures"].update({s: signatures[s] for s in changed})
+    alerts += check_stuck_rules(frame, rules["stuck_rules"], now, now_text)
+    state["frame"] = frame
+    save_alert_state(state)
+    append_alerts(alerts)
+    return alerts
+
+# 读取出错（文件被拒绝、被占用等）的供应商本次不评估，避免数据缺失触发误报或重置停滞计时
+def run_alert_check():
+    if not os.path.exists(folder_path):
+        return
+    results = []
+    routed_files = route_files(results)
+    signatures = {supplier: get_files_signature(files) for supplier, files in routed_files.items()}
+    # 路由阶段只对能按文件名判断供应商的文件报错
+    failed_suppliers = {get_file_supplier(res["file"]) for res in results if res["status"] == "error"}
+    supplier_data_map = {}
+    for supplier, supplier_data, supplier_results in iter_supplier_data(routed_files):
+        if any(res["status"] == "error" for res in supplier_results):
+            failed_suppliers.add(supplier)
+        if supplier not in failed_suppliers:
+            supplier_data_map[supplier] = supplier_data
+    if failed_suppliers:
+        print(f"告警检查跳过{'、'.join(sorted(failed_suppliers))}：文件读取失败")
+    evaluate_alerts(supplier_data_map, signatures, time.time())
+
+# 定时检查；多个检查进程同时运行时只有抢到 scheduler.lock 的进程执行检查
+def run_alert_scheduler():
+    with open(get_alert_dir() / "scheduler.lock", 'a+') as lock_handle:
+        while not try_lock_file(lock_handle):
+            time.sleep(ALERT_CHECK_INTERVAL)
+        while True:
+            try:
+                run_alert_check()
+            except Exception as e:
+                print(f"告警检查失败: {e}")
+            time.sleep(ALERT_CHECK_INTERVAL)
+
+# 读取最近的告警（新的在前），按告警文件修改时间和大小缓存
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_recent_alerts(mtime_ns, size):
+    with open(get_alert_dir() / "outbox.jsonl", 'r', encoding='utf-8') as f:
+        lines = deque(f, maxlen=RECENT_ALERT_COUNT)
+    return pd.DataFrame([json.loads(line) for line in reversed(lines) if line.strip()], columns=["time", "type", "rule", "message"])
+
+def render_recent_alerts():
+    st.subheader("🔔 最近告警")
+    outbox_file = get_alert_dir() / "outbox.jsonl"
+    if not outbox_file.exists():
+        st.info("暂无告警")
+        return
+    stat = outbox_file.stat()
+    alerts = load_recent_alerts(stat.st_mtime_ns, stat.st_size)
+    if alerts.empty:
+        st.info("暂无告警")
+        return
+    alerts.columns = ["时间", "类型", "规则", "内容"]
+    st.dataframe(alerts, use_container_width=True, hide_index=True)
+
 # ---------------------- 主看板页面 ----------------------
 def dashboard_page():
     if not os.path.exists(folder_path):
         st.error(f"❌ 文件夹不存在！请确认路径：{folder_path}")
         return
 
+    start_time = time.perf_counter()
     results = []
-    with st.spinner("正在提取数据..."):
-        hexin_data = process_hexin(results)
-        rirong_data = process_rirong(results)
-        hongrun_data = process_hongrun(results)
-        weice_data = process_weice(results)
-
-    success_count = sum(1 for res in results if res["status"] == "success")
-    error_count = len(results) - success_count
+    routed_files = route_files(results)
+    data_version = get_data_version(routed_files)
+    filters = get_table_filters()
+    cached_view = get_cached_saved_view(data_version, filters)
+    device_color_cache = get_device_color_cache()
+    color_map = device_color_cache.get(data_version)
+
+    status_placeholder = st.empty()
+    tab1, tab2, tab3, tab4 = st.tabs(["📈 数据图", "📋 数据表", "🧮 透视", "🔄 变化"])
+    with tab1:
+        chart_placeholders, top_n = create_chart_placeholders()
+    with tab2:
+        table_placeholder = st.empty()
+    with tab3:
+        pivot_placeholder = st.empty()
+
+    # 各供应商解析完成即绘制其数据图，不必等待最慢的文件
+    supplier_data_map = {}
+    first_chart_time = None
+    # 有文件被拒绝或解析出错的供应商，数据不完整
+    incomplete_suppliers = {get_file_supplier(res["file"]) for res in results if res["status"] == "error"}
+    # 路由后解析出错（如文件被占用）的供应商；被拒绝的文件不计入数据版本，不影响缓存
+    parse_failed_suppliers = set()
+    for supplier, supplier_data, supplier_results in iter_supplier_data(routed_files):
+        supplier_data_map[supplier] = supplier_data
+        results.extend(supplier_results)
+        if any(res["status"] == "error" for res in supplier_results):
+            parse_failed_suppliers.add(supplier)
+        if supplier in chart_placeholders:
+            render_supplier_chart(chart_placeholders[supplier], supplier, supplier_data, filters, top_n, cached_view, color_map)
+            if first_chart_time is None:
+                first_chart_time = time.perf_counter() - start_time
+        progress_text = f"⏳ 正在提取数据：已完成 {'、'.join(supplier_data_map)}（{len(supplier_data_map)}/4）"
+        status_placeholder.info(progress_text)
+        table_placeholder.info(progress_text)
+        pivot_placeholder.info(progress_text)
+    complete_time = time.perf_counter() - start_time
+
+    error_count = sum(1 for res in results if res["status"] == "error")
     button_text = "文件读取失败" if error_count > 0 else "文件读取成功"
 
     if 'show_file_status' not in st.session_state:
@@ -738,24 +1822,45 @@ def dashboard_page():
     def toggle_file_status():
         st.session_state.show_file_status = not st.session_state.show_file_status
 
-    st.button(button_text, on_click=toggle_file_status)
+    with status_placeholder.container():
+        st.button(button_text, on_click=toggle_file_status)
+        st.caption(f"首张数据图 {first_chart_time or complete_time:.2f}s，全部数据 {complete_time:.2f}s")
 
-    if st.session_state.show_file_status:
-        with st.expander("文件读取详情", expanded=True):
-            for res in results:
-                if res["status"] == "success":
-                    st.success(res["msg"])
-                else:
-                    st.error(res["msg"])
+        if st.session_state.show_file_status:
+            with st.expander("文件读取详情", expanded=True):
+                for res in results:
+                    if res["status"] == "success":
+                        st.success(res["msg"])
+                    elif res["status"] == "warning":
+                        st.warning(res["msg"])
+                    else:
+                        st.error(res["msg"])
 
-    all_data = pd.concat([hexin_data, rirong_data, hongrun_data, weice_data], ignore_index=True)
-    tab1, tab2 = st.tabs(["📈 数据图", "📋 数据表"])
-    
-    with tab1:
-        render_charts(all_data)
-    
-    with tab2:
-        render_data_tables(all_data)
+    all_data = pd.concat([supplier_data_map[s] for s in ['禾芯', '日荣', '弘润', '伟测']], ignore_index=True)
+    # 解析出错时本次数据与数据版本不符，不写入按数据版本缓存的配色、视图和透视数据
+    cache_version = None if parse_failed_suppliers else data_version
+    # 数据版本首次加载时数据图先按各供应商临时配色绘制，全部数据到齐后按统一配色重绘
+    if color_map is None:
+        color_map = build_device_color_map(all_data)
+        if cache_version is not None:
+            device_color_cache.clear()
+            device_color_cache[data_version] = color_map
+        for supplier, placeholder in chart_placeholders.items():
+            render_supplier_chart(placeholder, supplier, supplier_data_map[supplier], filters, top_n, cached_view, color_map)
+    save_snapshot(all_data, incomplete_suppliers | parse_failed_suppliers)
+    if cache_version is not None:
+        schedule_saved_view_warmup(all_data, data_version)
+
+    with table_placeholder.container():
+        render_data_tables(all_data, cache_version)
+
+    with pivot_placeholder.container():
+        render_pivot_table(all_data, cache_version)
+
+    with tab4:
+        render_snapshot_diff()
+        st.write("---")
+        render_recent_alerts()
 
 # ---------------------- 主应用 ----------------------
 def main_app():
@@ -831,4 +1936,7 @@ def main():
         main_app()
 
 if __name__ == "__main__":
-    main()
+    if "--alert-scheduler" in sys.argv:
+        run_alert_scheduler()
+    else:
+        main()